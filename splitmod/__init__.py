@@ -21,21 +21,16 @@ used, working around this is both hacky and I haven't been able to get it to wor
 Tableing this to have a bit of a rethink.
 """
 
+from __future__ import annotations
+
 import sys
 import typing as t
-from contextlib import contextmanager
-from functools import partial
-from importlib import import_module
-from importlib.abc import Loader, MetaPathFinder, PathEntryFinder
-from importlib.machinery import (
-    FileFinder,
-    PathFinder,
-    SourceFileLoader,
-    SourcelessFileLoader,
-)
-from os import PathLike
 from pathlib import Path
 
+if t.TYPE_CHECKING:
+    from os import PathLike
+    from types import CodeType
+
 VERSION = (1, 0, 0)
 
 __title__ = "SplitMod"
@@ -50,94 +45,58 @@ __all__ = [
     "set_default",
     "is_defined",
     "get",
+    "compile_layout",
+    "included_files",
 ]
 
+_MACHINERY = (
+    "SplitModuleLoader",
+    "SplitFinder",
+    "SplitModuleFinder",
+)
+
+
+def __getattr__(name):
+    # the finder/loader machinery lives in _importers and is only imported
+    # on first use - see that module's docstring
+    if name in _MACHINERY:
+        from . import _importers
+
+        return getattr(_importers, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 class _NotGiven:
     pass
 
 
-class SplitModuleLoader(Loader):
-    scope: t.Dict[str, t.Any]
-    is_loading: bool = False
-    path: t.Optional[str] = None
-    fullname: t.Optional[str] = None
-
-    def __init__(self, scope: t.Dict[str, t.Any]):
-        self.scope = scope
-
-    def create_module(self, spec):
-        return None  # do normal module creation logic
-
-    def exec_module(self, module):
-        code_file = self.path or getattr(module.__spec__, "origin", None)
-        assert code_file
-        self.is_loading = True
-        stack = self.scope.get("__included_files__", [])
-        stack.append(Path(code_file))
-        with open(code_file, "r") as file:
-            exec(file.read(), self.scope)
-        self.is_loading = False
-        self.scope["__included_files__"] = stack
-
-    def __call__(self, fullname: str, path: str):
-        """
-        When used as a FileFinder loader we make this object callable to spoof
-        it as a class. The FileFinder passes these two init parameters to each
-        loader class.
-        """
-        self.fullname = fullname
-        self.path = path
-        return self
-
-
-class SplitFinder(MetaPathFinder):
-    split_loader: SplitModuleLoader
-
-    def __init__(self, loader: SplitModuleLoader, *args, **kwargs):
-        self.split_loader = loader
-        super().__init__(*args, **kwargs)
-
-    def __enter__(self):
-        sys.meta_path.insert(0, self)
-        return self
-
-    def __exit__(self, exc_type, exc_value, traceback):
-        sys.meta_path.remove(self)
-
-
-class SplitFileFinder(SplitFinder):
-    def __init__(self, scope: t.Dict[str, t.Any], path: PathLike, suffix: str):
-        loader = SplitModuleLoader(scope)
-        self.file_finder = FileFinder(
-            str(path),
-            (  # type: ignore
-                loader,  # pyright: ignore[reportArgumentType]
-                [
-                    suffix,
-                ],
-            ),
-        )
-        super().__init__(loader)
+_getframe = sys._getframe
+"""
+Bound once at import so the per-setting helpers below avoid the repeated
+LOAD_GLOBAL + LOAD_ATTR on sys._getframe - they are called once per setting
+line in large settings files.
+"""
 
-    def find_spec(self, fullname, path=None, target=None):
-        return self.file_finder.find_spec(fullname, target=target)
+
+INCLUDE_STACK: t.List[str] = []
+"""
+The paths of the files included so far, in inclusion order. Scopes that
+include files share this list by identity through their
+``__included_files__`` key. Held as strings so includes do not pay a Path
+construction each - use included_files() for Path objects.
+"""
 
 
-class SplitModuleFinder(SplitFinder, PathFinder):  # pyright: ignore[reportIncompatibleMethodOverride]
-    def __init__(self, scope: t.Dict[str, t.Any]):
-        super().__init__(SplitModuleLoader(scope))
+def included_files() -> t.List[Path]:
+    """
+    Returns the files that have been included so far, in inclusion order.
 
-    def find_spec(self, fullname, path, target=None):  # pyright: ignore[reportIncompatibleMethodOverride]
-        if self.split_loader.is_loading:
-            return None
-        spec = super().find_spec(fullname, path, target)
-        if spec:
-            spec.loader = self.split_loader
-        return spec
+    :return: A list of Paths of the included files
+    """
+    return [Path(file) for file in INCLUDE_STACK]
 
 
-def set_default(var_name, default, set_if_none=True):
+def set_default(var_name, default, set_if_none=True, _f=_getframe):
     """
     Set the value of the given variable in the calling scope to a default value if it has been not been previously
     defined.
@@ -147,23 +106,25 @@ def set_default(var_name, default, set_if_none=True):
     :param set_if_none: Treat the variable as undefined if it is None, default: True
     :return: the variable that was set
     """
-    scope = sys._getframe(1).f_globals
-    if var_name not in scope or set_if_none and scope[var_name] is None:
+    scope = _f(1).f_globals
+    value = scope.get(var_name, _NotGiven)
+    if value is _NotGiven or set_if_none and value is None:
         scope[var_name] = default
-    return scope[var_name]
+        return default
+    return value
 
 
-def is_defined(var_name):
+def is_defined(var_name, _f=_getframe):
     """
     Returns true if the given variable has been defined in the calling scope.
 
     :param var_name: The name of the variable to check for
     :return: True if the variable is defined, false otherwise
     """
-    return var_name in sys._getframe(1).f_globals
+    return var_name in _f(1).f_globals
 
 
-def get(var_name, default=_NotGiven):
+def get(var_name, default=_NotGiven, _f=_getframe):
     """
     Returns the value of the setting if it exists, if it does not exist the value
     given to default is returned. If no default value is given and the setting
@@ -173,33 +134,12 @@ def get(var_name, default=_NotGiven):
     :param default: The default value to return if the variable does not exist
     :raises NameError: if the name is undefined and no default is given.
     """
-    value = sys._getframe(1).f_globals.get(var_name, default)
+    value = _f(1).f_globals.get(var_name, default)
     if value is _NotGiven:
         raise NameError(f"{var_name} setting variable is not defined.", name=var_name)
     return value
 
 
-@contextmanager
-def _load_file_path_as_module(root: PathLike):
-    root = Path(root)
-
-    def finder(path: str) -> PathEntryFinder:
-        pth = Path(path)
-        if any(root == parent for parent in pth.parents) or root == pth:
-            return FileFinder(
-                path, (SourceFileLoader, [".py"]), (SourcelessFileLoader, [".pyc"])
-            )
-        raise ImportError()
-
-    sys.path_hooks.insert(0, finder)
-    sys.path.append(str(root))
-    sys.path_importer_cache.clear()
-    yield finder
-    sys.path_hooks.remove(finder)
-    sys.path.remove(str(root))
-    sys.path_importer_cache.clear()
-
-
 def include(
     resource: t.Union[str, PathLike],
     scope: t.Optional[t.Dict[str, t.Any]] = None,
@@ -214,70 +154,125 @@ def include(
         scope from the calling context will be used which is most likely what you want.
     :param optional: If true, if the file does not exist no error will be thrown.
     """
-    mod = None
-    loader = None
-    try:
-        frame = sys._getframe(1)
-        scope = scope or frame.f_globals
-
-        def use_loaded(mod_path) -> bool:
-            module = sys.modules.get(mod_path, None)
-            if module:
-                scope.update(vars(module))
-                return True
-            return False
-
-        if isinstance(resource, Path) or (
-            isinstance(resource, str) and "/" in resource
-        ):
-            resource = Path(resource)
-            if use_loaded(".".join(resource.parts)):
-                return
-            root = Path(frame.f_code.co_filename).parent
-            parent = ""
-            if len(resource.parts) > 1:
-                # use the normal import chain for all parents incase they havent
-                # been loaded yet
-                parent = ".".join(resource.parts[0:-1]).lstrip(".")
-                with _load_file_path_as_module(root):
-                    mod = import_module(parent)
-                    assert mod.__spec__
-                    loader = mod.__spec__.loader
-                    mod.__spec__.loader = SplitModuleLoader(scope)
-                    mod.__loader__ = mod.__spec__.loader
-                    sys.modules[parent] = mod
-            # import ipdb
-            # ipdb.set_trace()
-            with SplitFileFinder(scope, root, resource.suffix):
-                import_module(f"{parent}.{resource.stem}".lstrip("."))
-        else:
-            resource = str(resource)
-            if use_loaded(resource):
-                return
-            if "." in resource:
-                # use the normal import chain for all parents incase they havent
-                # been loaded yet
-                parent = ".".join(resource.split(".")[0:-1])
-                mod = import_module(parent)
-                assert mod.__spec__
-                loader = mod.__spec__.loader
-                mod.__spec__.loader = SplitModuleLoader(scope)
-                mod.__loader__ = mod.__spec__.loader
-                sys.modules[parent] = mod
-            with SplitModuleFinder(scope):
-                import_module(str(resource))
-
-    except Exception:
-        if optional:
-            return
-        raise
-    finally:
-        if mod and loader:
-            assert mod.__spec__
-            mod.__spec__.loader = loader
-
-
-optional = partial(include, optional=True)
-"""
-A wrapper for include() that sets optional to True by default.
-"""
+    from ._importers import _include
+
+    frame = _getframe(1)
+    _include(resource, scope or frame.f_globals, frame.f_code.co_filename, optional)
+
+
+def optional(
+    resource: t.Union[str, PathLike],
+    scope: t.Optional[t.Dict[str, t.Any]] = None,
+):
+    """
+    A wrapper for include() that sets optional to True by default.
+
+    :param resource: An import path or pathlike object
+    :param scope: The outer scope that the resource path should be execute in. By default the
+        scope from the calling context will be used which is most likely what you want.
+    """
+    # resolve the calling frame here rather than delegating to include() -
+    # a plain wrapper call would put our own frame between include() and
+    # the caller whose globals it must default to
+    from ._importers import _include
+
+    frame = _getframe(1)
+    _include(resource, scope or frame.f_globals, frame.f_code.co_filename, True)
+
+
+def compile_layout(
+    entrypoint: t.Union[str, PathLike], use_cache: bool = True
+) -> CodeType:
+    """
+    Ahead-of-time compile the given settings entrypoint and every file it
+    includes into a single code object. include() and optional() calls whose
+    argument is a literal path are resolved at compile time and their
+    statements inlined in call order, recursively, with each file inlined at
+    most once. Executing the returned code object with exec() then loads the
+    whole layout without installing any import machinery.
+
+    The compiled layout is cached beside the entrypoint under __pycache__
+    and reused until any of the contributing source files change.
+
+    :param entrypoint: The path of the module whose layout should be compiled.
+    :param use_cache: If true, read and write the on-disk cache, default: True
+    :return: The code object for the flattened layout.
+    """
+    import ast
+    import hashlib
+    import marshal
+    from importlib.util import MAGIC_NUMBER
+
+    entrypoint = Path(entrypoint)
+    digests: t.Dict[str, bytes] = {}
+
+    cache_file = entrypoint.parent / "__pycache__" / f"{entrypoint.stem}.splitmod.pyc"
+    if use_cache:
+        try:
+            magic, cached_digests, code = marshal.loads(cache_file.read_bytes())
+            if magic == MAGIC_NUMBER and all(
+                hashlib.sha256(Path(pth).read_bytes()).digest() == digest
+                for pth, digest in cached_digests.items()
+            ):
+                return code
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
+
+    def is_include(call: ast.expr) -> bool:
+        # a call to include()/optional() with a literal path argument that
+        # we can resolve at compile time
+        return (
+            isinstance(call, ast.Call)
+            and isinstance(call.func, ast.Name)
+            and call.func.id in ("include", "optional")
+            and bool(call.args)
+            and isinstance(call.args[0], ast.Constant)
+            and isinstance(call.args[0].value, str)
+            and (
+                "/" in call.args[0].value
+                or "\\" in call.args[0].value
+                or call.args[0].value.endswith(".py")
+            )
+        )
+
+    def flatten(path: Path, seen: t.Set[Path]) -> t.List[ast.stmt]:
+        path = path.resolve()
+        if path in seen:
+            return []  # include files only once - also breaks recursion
+        seen.add(path)
+        source = path.read_bytes()
+        digests[str(path)] = hashlib.sha256(source).digest()
+        body: t.List[ast.stmt] = []
+        for stmt in ast.parse(source, str(path)).body:
+            calls: t.List[ast.expr] = []
+            if isinstance(stmt, ast.Expr):
+                if isinstance(stmt.value, ast.Call):
+                    calls = [stmt.value]
+                elif isinstance(stmt.value, ast.Tuple):
+                    calls = list(stmt.value.elts)
+            if calls and all(is_include(call) for call in calls):
+                for call in calls:
+                    target = path.parent / call.args[0].value  # type: ignore[attr-defined]
+                    if not target.exists():
+                        if call.func.id == "optional":  # type: ignore[attr-defined]
+                            continue
+                        raise ModuleNotFoundError(
+                            f"No module named {str(target)!r}", name=str(target)
+                        )
+                    body.extend(flatten(target, seen))
+            else:
+                body.append(stmt)
+        return body
+
+    code = compile(
+        ast.Module(body=flatten(entrypoint, set()), type_ignores=[]),
+        str(entrypoint),
+        "exec",
+    )
+    if use_cache:
+        try:
+            cache_file.parent.mkdir(exist_ok=True)
+            cache_file.write_bytes(marshal.dumps((MAGIC_NUMBER, digests, code)))
+        except OSError:
+            pass
+    return code
@@ -0,0 +1,345 @@
+"""
+The import machinery behind include(). This lives in its own module so that
+importing splitmod for the scope helpers (set_default, get, is_defined)
+does not pay the importlib.abc/importlib.machinery cold-import cost - it is
+only loaded the first time a file is actually included.
+"""
+
+import os
+import sys
+import typing as t
+from importlib import import_module
+from importlib.abc import Loader, MetaPathFinder, PathEntryFinder
+from importlib.machinery import (
+    FileFinder,
+    PathFinder,
+    SourceFileLoader,
+    SourcelessFileLoader,
+)
+from importlib.util import module_from_spec, spec_from_file_location
+from os import PathLike
+from pathlib import Path
+from types import CodeType
+
+from . import INCLUDE_STACK
+
+_CODE_CACHE: t.Dict[t.Tuple[str, int, int], CodeType] = {}
+"""
+Compiled code objects for included files, keyed by (path, mtime_ns, size) so
+that repeated includes of the same unmodified file skip both the disk read
+and the recompile.
+"""
+
+
+class _SplitLoaderFactory:
+    """
+    Builds a SplitModuleLoader per included file. The factory holds the
+    state shared between those loaders - the scope they execute into and
+    whether one of them is currently executing.
+    """
+
+    # __slots__ keeps attribute access on the import hot path going through
+    # C-level slot descriptors instead of instance __dict__ probes
+    __slots__ = ("scope", "is_loading")
+
+    scope: t.Dict[str, t.Any]
+    is_loading: bool
+
+    def __init__(self, scope: t.Dict[str, t.Any]):
+        self.scope = scope
+        self.is_loading = False
+        # one dict write ever - every exec after this is a pure list append
+        scope.setdefault("__included_files__", INCLUDE_STACK)
+
+    def __call__(
+        self, fullname: t.Optional[str] = None, path: t.Optional[str] = None
+    ) -> "SplitModuleLoader":
+        """
+        Finders (e.g. FileFinder) treat loaders as classes and pass these
+        two init parameters when constructing one per file - being callable
+        lets the factory be used wherever a loader class is expected.
+        """
+        return SplitModuleLoader(self, fullname, path)
+
+
+class SplitModuleLoader(Loader):
+    __slots__ = ("factory", "fullname", "path")
+
+    factory: _SplitLoaderFactory
+    fullname: t.Optional[str]
+    path: t.Optional[str]
+
+    def __init__(
+        self,
+        factory: _SplitLoaderFactory,
+        fullname: t.Optional[str] = None,
+        path: t.Optional[str] = None,
+    ):
+        self.factory = factory
+        self.fullname = fullname
+        self.path = path
+
+    def create_module(self, spec):
+        return None  # do normal module creation logic
+
+    def exec_module(self, module):
+        code_file = self.path or getattr(module.__spec__, "origin", None)
+        assert code_file
+        factory = self.factory
+        scope = factory.scope
+        factory.is_loading = True
+        INCLUDE_STACK.append(code_file)
+        st = os.stat(code_file)
+        key = (code_file, st.st_mtime_ns, st.st_size)
+        code = _CODE_CACHE.get(key)
+        if code is None:
+            # read as raw bytes - compile() honors any coding cookie itself
+            # and buffering=0 skips the BufferedReader layer for a file we
+            # consume in one readall
+            with open(code_file, "rb", buffering=0) as file:
+                code = compile(file.read(), code_file, "exec")
+            _CODE_CACHE[key] = code
+        exec(code, scope)
+        factory.is_loading = False
+
+
+class SplitFinder(MetaPathFinder):
+    __slots__ = ("loader_factory",)
+
+    loader_factory: _SplitLoaderFactory
+
+    def __init__(self, loader_factory: _SplitLoaderFactory, *args, **kwargs):
+        self.loader_factory = loader_factory
+        super().__init__(*args, **kwargs)
+
+    def __enter__(self):
+        sys.meta_path.insert(0, self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        sys.meta_path.remove(self)
+
+
+_DIR_CACHE: t.Dict[str, t.Tuple[int, t.FrozenSet[str]]] = {}
+"""
+Directory listings keyed by path along with the mtime they were taken at,
+so probing for included files does not re-run readdir per include.
+"""
+
+
+def _scan_dir(root: t.Union[str, PathLike]) -> t.FrozenSet[str]:
+    """
+    Return the set of entry names in the given directory, memoized on the
+    directory's mtime.
+    """
+    key = str(root)
+    mtime = os.stat(key).st_mtime_ns
+    cached = _DIR_CACHE.get(key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    names = frozenset(entry.name for entry in os.scandir(key))
+    _DIR_CACHE[key] = (mtime, names)
+    return names
+
+
+def _direct_include(fullname: str, path: str, scope: t.Dict[str, t.Any]):
+    """
+    Load the given file through a SplitModuleLoader directly. For a known
+    file path, installing a meta-path finder and walking the import chain
+    just to arrive back at our own loader is pure ceremony - build the spec
+    and exec it ourselves.
+    """
+    spec = spec_from_file_location(
+        fullname, path, loader=_SplitLoaderFactory(scope)(fullname, path)
+    )
+    assert spec and spec.loader
+    module = module_from_spec(spec)
+    sys.modules[fullname] = module
+    # mark the spec in-progress the way _bootstrap._load does so that
+    # self-inclusion hits the recursion guard in the sys.modules fast path -
+    # setattr because _initializing is not part of ModuleSpec's public type
+    setattr(spec, "_initializing", True)
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        sys.modules.pop(fullname, None)
+        raise
+    finally:
+        setattr(spec, "_initializing", False)
+
+
+class SplitModuleFinder(SplitFinder, PathFinder):  # pyright: ignore[reportIncompatibleMethodOverride]
+    __slots__ = ("target",)
+
+    target: str
+
+    def __init__(self, scope: t.Dict[str, t.Any], target: str):
+        self.target = target
+        super().__init__(_SplitLoaderFactory(scope))
+
+    def find_spec(self, fullname, path, target=None):  # pyright: ignore[reportIncompatibleMethodOverride]
+        # only the include()-targeted module gets its loader rewritten, so
+        # bail immediately for everything the executed file imports - this
+        # finder sits at meta_path[0] and is consulted for every import
+        # performed while the include is running
+        if fullname != self.target or self.loader_factory.is_loading:
+            return None
+        spec = super().find_spec(fullname, path, target)
+        if spec:
+            spec.loader = self.loader_factory(fullname, spec.origin)
+        return spec
+
+
+class _PathHookCtx:
+    """
+    Context manager that makes files under the given root importable as top
+    level modules while it is active. Hand written rather than built with
+    @contextmanager - the generator machinery allocates a frame and runs a
+    next()/throw() round trip per use, which include() pays once per file
+    with nested parents.
+    """
+
+    __slots__ = ("root", "finder")
+
+    def __init__(self, root: t.Union[str, PathLike]):
+        self.root = str(root)
+        prefix = self.root + os.sep
+        loader_details = (
+            (SourceFileLoader, [".py"]),
+            (SourcelessFileLoader, [".pyc"]),
+        )
+
+        def finder(path: str) -> PathEntryFinder:
+            # a plain prefix match - probed paths come from sys.path and
+            # package __path__ entries which are already normalized, so no
+            # Path objects need to be built per probe
+            if path != self.root and not path.startswith(prefix):
+                raise ImportError()
+            return FileFinder(path, *loader_details)
+
+        self.finder = finder
+
+    def _invalidate(self):
+        # only drop cached finders for paths under root - clearing the whole
+        # importer cache would force every subsequent import to re-probe
+        # every path hook for every sys.path entry. Match root itself or a
+        # separator-terminated prefix, the same test the finder hook makes,
+        # so a sibling like root + "_extra" keeps its cached finder
+        root = self.root
+        prefix = root + os.sep
+        cache = sys.path_importer_cache
+        for path in [pth for pth in cache if pth == root or pth.startswith(prefix)]:
+            del cache[path]
+
+    def __enter__(self):
+        sys.path_hooks.insert(0, self.finder)
+        sys.path.append(self.root)
+        self._invalidate()
+        return self.finder
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        sys.path_hooks.remove(self.finder)
+        sys.path.remove(self.root)
+        self._invalidate()
+
+
+def _include(
+    resource: t.Union[str, PathLike],
+    scope: t.Dict[str, t.Any],
+    caller_file: str,
+    optional: bool = False,
+):
+    """
+    The implementation behind include() - the public wrapper resolves the
+    calling frame and forwards its scope and file here.
+    """
+    try:
+        # compute the path pieces and the dotted module path once, with
+        # plain string ops - no Path allocation, no parts re-walks
+        modules = sys.modules
+        res = str(resource)
+        # a file name like "base.py" is a path even without a separator
+        is_path = isinstance(resource, Path) or (
+            "/" in res or "\\" in res or res.endswith(".py")
+        )
+        if is_path:
+            parts = [
+                part
+                for part in res.replace("\\", "/").split("/")
+                if part and part != "."
+            ]
+            stem, dot, ext = parts[-1].rpartition(".")
+            stem = stem if dot else ext
+            parent = ".".join(parts[:-1])
+            full = f"{parent}.{stem}" if parent else stem
+        else:
+            parent = res.rpartition(".")[0]
+            full = res
+
+        # fast path - if the target module has already been loaded just pull
+        # its symbols out of sys.modules instead of re-running the importer
+        module = modules.get(full, None)
+        if module is not None and is_path:
+            # the dotted name of a relative path is ambiguous between
+            # projects - "components/base.py" included from two different
+            # directories is two different files under the same key. Only
+            # reuse the cached module when it came from the file this
+            # caller is naming, otherwise fall through to _direct_include
+            origin = getattr(getattr(module, "__spec__", None), "origin", None)
+            if origin != os.path.join(os.path.dirname(caller_file), *parts):
+                module = None
+        if module is not None:
+            if isinstance(getattr(module, "__loader__", None), SplitModuleLoader):
+                spec = getattr(module, "__spec__", None)
+                if getattr(spec, "_initializing", False):
+                    # a split module that is still initializing is including
+                    # itself - return without touching the scope, copying the
+                    # shell's __name__/__spec__/__file__ over the caller's
+                    # would corrupt the executing module's identity
+                    return
+                # split-loaded modules were exec'd into some other scope so
+                # their own namespace is empty - re-exec the (cached) code
+                # into this scope instead, holding the _initializing guard
+                # like _direct_include does so a self-including file cannot
+                # recurse through this branch
+                loader = _SplitLoaderFactory(scope)(full, getattr(spec, "origin", None))
+                if spec is not None:
+                    setattr(spec, "_initializing", True)
+                try:
+                    loader.exec_module(module)
+                finally:
+                    if spec is not None:
+                        setattr(spec, "_initializing", False)
+            else:
+                scope.update(vars(module))
+            return
+
+        if is_path:
+            root = os.path.dirname(caller_file)
+            if parent and parent not in modules:
+                # use the normal import chain for all parents incase they havent
+                # been loaded yet
+                with _PathHookCtx(root):
+                    import_module(parent)
+            # with all parents resolved the target file's location is fully
+            # known - exec it directly, no finder installation at all
+            directory = os.path.join(root, *parts[:-1])
+            try:
+                found = parts[-1] in _scan_dir(directory)
+            except OSError:
+                found = False
+            if not found:
+                raise ModuleNotFoundError(f"No module named {full!r}", name=full)
+            _direct_include(full, os.path.join(directory, parts[-1]), scope)
+        else:
+            if parent:
+                # use the normal import chain for all parents incase they havent
+                # been loaded yet
+                import_module(parent)
+            with SplitModuleFinder(scope, full):
+                import_module(full)
+
+    except Exception:
+        if optional:
+            return
+        raise
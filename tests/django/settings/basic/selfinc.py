@@ -0,0 +1,7 @@
+"""This fixture includes itself to exercise the recursion guard."""
+
+from splitmod import include
+
+include("selfinc.py")
+
+SELF_INC = True
@@ -0,0 +1 @@
+WHO = "first"
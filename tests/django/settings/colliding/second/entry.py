@@ -0,0 +1,3 @@
+from splitmod import include
+
+include("who.py")
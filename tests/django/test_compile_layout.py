@@ -0,0 +1,30 @@
+import os
+
+from splitmod import compile_layout
+
+_MERGED = os.path.join(
+    os.path.dirname(__file__),
+    "settings",
+    "merged",
+    "__init__.py",
+)
+
+
+def test_compile_layout():
+    """The flattened layout must produce the same settings as include()."""
+    scope = {}
+    exec(compile_layout(_MERGED, use_cache=False), scope)
+
+    assert scope["SECRET_KEY"]
+    # testing.py is inlined after static.py so it must win:
+    assert scope["STATIC_ROOT"] == "test_folder"
+
+
+def test_compile_layout_cached():
+    """The cached layout must execute the same as a fresh compile."""
+    compile_layout(_MERGED)
+    scope = {}
+    exec(compile_layout(_MERGED), scope)
+
+    assert scope["SECRET_KEY"]
+    assert scope["STATIC_ROOT"] == "test_folder"
@@ -53,6 +53,34 @@ def test_unicode_passed(scope, fixture_file):
     assert _FIXTURE_VALUE in scope
 
 
+def test_repeated_self_include(scope):
+    """Including a self-including file into a second scope must not recurse."""
+    path = os.path.join("settings", "basic", "selfinc.py")
+    include(path, scope=scope)
+    assert scope["SELF_INC"]
+
+    fresh = type(scope)()
+    include(path, scope=fresh)
+    assert fresh["SELF_INC"]
+
+
+def test_same_relative_include_from_two_directories(scope):
+    """The same relative path in two directories must stay two files."""
+    include(os.path.join("settings", "colliding", "first", "entry.py"), scope=scope)
+    assert scope["WHO"] == "first"
+
+    fresh = type(scope)()
+    include(os.path.join("settings", "colliding", "second", "entry.py"), scope=fresh)
+    assert fresh["WHO"] == "second"
+
+
+def test_dotted_module_include(scope):
+    """A dotted module path must resolve through the import machinery."""
+    include("tests.django.settings.merged.components.base", scope=scope)
+
+    assert scope["SECRET_KEY"]
+
+
 def test_caller_scope_automatically(fixture_file):
     """
     Tests `include` function for automatic `globals()` extraction.